@@ -8,12 +8,36 @@ import os
 
 import aiosqlite
 from dotenv import load_dotenv
-from think import LLM, ask
+from jinja2 import Template
+from think import LLM, Chat
+from think.prompt import JinjaStringTemplate, strip_block
 from constants import CATEGORIES
+from db import tune
+from ratelimit import TokenBucket, is_rate_limit_error
 
 load_dotenv()
 
 DB_PATH = "../data/db.sqlite"
+
+# Maximum number of articles analyzed concurrently (each article issues 3 LLM calls)
+ANALYZE_CONCURRENCY = int(os.environ.get("ANALYZE_CONCURRENCY", "10"))
+
+# Provider rate limits (requests and tokens per minute) for the analyze model
+ANALYZE_RPM = int(os.environ.get("ANALYZE_RPM", "500"))
+ANALYZE_TPM = int(os.environ.get("ANALYZE_TPM", "200000"))
+RATE_LIMIT_RETRIES = 3
+
+# Number of analyzed articles saved per commit
+SAVE_BATCH_SIZE = 100
+
+rpm_limiter = TokenBucket(rate=ANALYZE_RPM / 60, capacity=ANALYZE_RPM)
+tpm_limiter = TokenBucket(rate=ANALYZE_TPM / 60, capacity=ANALYZE_TPM)
+
+# Prompts keep all static text (instructions, category list) in front and the
+# per-article variables strictly at the end, so every request shares a
+# byte-identical prefix. Providers cache prompt prefixes automatically once they
+# reach ~1024 tokens, which the categorization prompt does thanks to the
+# category list; cached prefix tokens are billed at a discount and skip prefill.
 ARTICLE_SUMMARY_PROMPT = """
 Summarize the following article in 3-5 sentences. Focus on the key points and main takeaways.
 Do not prefix the output with "-" or "This article contains..." or anything else - output just
@@ -43,6 +67,49 @@ Here is the text of the article:
 {{ article }}
 """
 
+
+def compile_prompt(prompt: str) -> Template:
+    """Compile a prompt template once, with the same settings `think.ask` uses."""
+    return JinjaStringTemplate().env.from_string(strip_block(prompt))
+
+
+ARTICLE_SUMMARY_TEMPLATE = compile_prompt(ARTICLE_SUMMARY_PROMPT)
+COMMENTS_SUMMARY_TEMPLATE = compile_prompt(COMMENTS_SUMMARY_PROMPT)
+CATEGORIZATION_TEMPLATE = compile_prompt(CATEGORIZATION_PROMPT)
+
+# Category list for the categorization prompt, in the format: (slug, description)
+CATEGORIES_LIST = "\n".join(f"({slug}, {description})" for slug, _, description in CATEGORIES)
+
+
+async def ask_template(llm: LLM, template: Template, **kwargs) -> str:
+    """
+    Render a precompiled prompt template and ask the LLM.
+
+    Requests are throttled to stay within the configured request and token
+    rate limits. If the provider still responds with a rate limit error, the
+    limiters slow down and the request is retried.
+    """
+    prompt = template.render(**kwargs)
+    # Rough estimate of ~4 characters per token
+    estimated_tokens = len(prompt) // 4
+
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        await rpm_limiter.acquire()
+        await tpm_limiter.acquire(estimated_tokens)
+        try:
+            response = await llm(Chat().user(prompt))
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == RATE_LIMIT_RETRIES:
+                raise
+            rpm_limiter.slow_down()
+            tpm_limiter.slow_down()
+            continue
+
+        rpm_limiter.speed_up()
+        tpm_limiter.speed_up()
+        return response
+
+
 async def get_contents_to_analyze(db: aiosqlite.Connection) -> list[tuple[int, str, str]]:
     """
     Get contents that have articles but no analysis yet.
@@ -57,10 +124,9 @@ async def get_contents_to_analyze(db: aiosqlite.Connection) -> list[tuple[int, s
         """
         SELECT c.id, c.article, c.comments
         FROM contents c
-        LEFT JOIN analysis a ON a.content_id = c.id
         WHERE c.article IS NOT NULL
           AND c.article != ''
-          AND a.id IS NULL
+          AND NOT EXISTS (SELECT 1 FROM analysis a WHERE a.content_id = c.id)
         """
     )
     rows = await cursor.fetchall()
@@ -79,38 +145,43 @@ async def summarize_article(llm: LLM, article: str) -> str:
         Summary text (3-5 sentences)
     """
 
-    summary = await ask(llm, ARTICLE_SUMMARY_PROMPT, article=article)
+    summary = await ask_template(llm, ARTICLE_SUMMARY_TEMPLATE, article=article)
     return summary
 
 
 async def summarize_comments(llm: LLM, comments: str) -> str:
-    summary = await ask(llm, COMMENTS_SUMMARY_PROMPT, comments=comments)
+    summary = await ask_template(llm, COMMENTS_SUMMARY_TEMPLATE, comments=comments)
     return summary
 
 
-async def categorize(llm: LLM, article: str, categories: list) -> str:
-    cats_str = "\n".join([f"({t[0]}, {t[1]})" for t in categories])
-    categories = await ask(llm, CATEGORIZATION_PROMPT, article=article, categories=cats_str)
+async def categorize(llm: LLM, article: str) -> str:
+    categories = await ask_template(llm, CATEGORIZATION_TEMPLATE, article=article, categories=CATEGORIES_LIST)
     return categories
 
 
-async def save_analysis(db: aiosqlite.Connection, content_id: int, article_summary: str, comments_summary: str, categories: str) -> None:
+async def save_analysis_many(db: aiosqlite.Connection, rows: list[tuple[int, str, str, str]]) -> None:
     """
-    Save the article summary to the analysis table.
+    Save article analyses to the analysis table in a single transaction.
+
+    Contents that were analyzed in the meantime (e.g. by another run, while a
+    batch job was pending) keep their existing analysis and are skipped.
 
     Args:
         db: Database connection
-        content_id: ID of the content record
-        article_summary: Generated article summary
-        comments_summary: Generated comments summary
-        categories: Selected categories for the article
+        rows: List of (content_id, article_summary, comments_summary, categories) tuples
     """
-    await db.execute(
+    if not rows:
+        return
+
+    # Checked per row rather than with ON CONFLICT, which would need the unique
+    # index on analysis.content_id (only created on startup by the API)
+    await db.executemany(
         """
         INSERT INTO analysis (content_id, article_summary, comments_summary, categories)
-        VALUES (?, ?, ?, ?)
+        SELECT ?1, ?2, ?3, ?4
+        WHERE NOT EXISTS (SELECT 1 FROM analysis WHERE content_id = ?1)
         """,
-        (content_id, article_summary, comments_summary, categories),
+        rows,
     )
     await db.commit()
 
@@ -120,14 +191,12 @@ async def generate_summaries():
     Main analysis procedure.
     """
 
-    # Extract just the slug and description from categories.
-    categories = [(c[0], c[2]) for c in CATEGORIES]
-
     print("Starting article analysis...")
 
     llm = LLM.from_url("openai:///gpt-5-nano")
 
     async with aiosqlite.connect(DB_PATH) as db:
+        await tune(db)
         contents = await get_contents_to_analyze(db)
 
         if not contents:
@@ -136,20 +205,45 @@ async def generate_summaries():
 
         print(f"Found {len(contents)} articles to analyze")
 
+        sem = asyncio.Semaphore(ANALYZE_CONCURRENCY)
+
+        async def process(content_id: int, article: str, comments: str) -> tuple[int, str, str, str]:
+            # The TaskGroup cancels the remaining calls for this article as
+            # soon as one of them fails, instead of leaving them running.
+            async with sem, asyncio.TaskGroup() as tg:
+                article_summary = tg.create_task(summarize_article(llm, article))
+                comments_summary = tg.create_task(summarize_comments(llm, comments))
+                selected_categories = tg.create_task(categorize(llm, article))
+            return (
+                content_id,
+                article_summary.result(),
+                comments_summary.result(),
+                selected_categories.result(),
+            )
+
+        rows = []
         analyzed_count = 0
         failed_count = 0
-        for i, (content_id, article, comments) in enumerate(contents):
-            try:
-                article_summary, comments_summary, selected_categories = await asyncio.gather(
-                    summarize_article(llm, article),
-                    summarize_comments(llm, comments),
-                    categorize(llm, article, categories)
-                )
-                await save_analysis(db, content_id, article_summary, comments_summary, selected_categories)
-                analyzed_count += 1
-            except Exception as e:
-                print(f"  Error: {e}")
-                failed_count += 1
+        try:
+            for result in asyncio.as_completed([process(*content) for content in contents]):
+                try:
+                    rows.append(await result)
+                except Exception as e:
+                    errors = e.exceptions if isinstance(e, ExceptionGroup) else [e]
+                    for error in errors:
+                        print(f"  Error: {error}")
+                    failed_count += 1
+                    continue
+
+                # Save analyses in batches (one commit each) as they complete,
+                # so a run that fails or is interrupted keeps what it has paid for
+                if len(rows) >= SAVE_BATCH_SIZE:
+                    await save_analysis_many(db, rows)
+                    analyzed_count += len(rows)
+                    rows = []
+        finally:
+            await save_analysis_many(db, rows)
+            analyzed_count += len(rows)
 
         print("\n" + "=" * 60)
         print("Analysis complete!")
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Analyze phase (batch variant): Generate summaries and categories through the
+OpenAI Batch API.
+
+Produces the same analysis rows as analyze.py, but submits all prompts for all
+pending articles as a single batch job instead of issuing one request per
+prompt. Batch jobs are billed at half price and are not subject to the regular
+per-minute rate limits, at the cost of latency (up to the completion window).
+
+If the script is interrupted while waiting, run it again with
+--batch-id <id> to resume waiting for (and save the results of) the batch
+that was already submitted, instead of submitting and paying for a new one.
+"""
+
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+
+import aiosqlite
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from openai.types import Batch
+
+from analyze import (
+    ARTICLE_SUMMARY_TEMPLATE,
+    CATEGORIES_LIST,
+    CATEGORIZATION_TEMPLATE,
+    COMMENTS_SUMMARY_TEMPLATE,
+    DB_PATH,
+    get_contents_to_analyze,
+    save_analysis_many,
+)
+from db import tune
+
+load_dotenv()
+
+MODEL = "gpt-5-nano"
+COMPLETION_WINDOW = "24h"
+POLL_INTERVAL = 60  # Seconds between batch status checks
+
+# Batch states after which the job will not make any more progress
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_request(custom_id: str, prompt: str) -> dict:
+    """Build a single batch request line for the chat completions endpoint."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+        },
+    }
+
+
+def build_batch_input(contents: list[tuple[int, str, str]]) -> bytes:
+    """
+    Render all prompts for all articles into a JSONL batch input file.
+
+    Each article produces three requests, identified by "<content_id>:<kind>"
+    where kind is one of "article", "comments" or "categories".
+
+    Args:
+        contents: List of (content_id, article, comments) tuples
+
+    Returns:
+        JSONL file contents
+    """
+    lines = []
+    for content_id, article, comments in contents:
+        lines.append(
+            build_request(
+                f"{content_id}:article",
+                ARTICLE_SUMMARY_TEMPLATE.render(article=article),
+            )
+        )
+        lines.append(
+            build_request(
+                f"{content_id}:comments",
+                COMMENTS_SUMMARY_TEMPLATE.render(comments=comments),
+            )
+        )
+        lines.append(
+            build_request(
+                f"{content_id}:categories",
+                CATEGORIZATION_TEMPLATE.render(article=article, categories=CATEGORIES_LIST),
+            )
+        )
+
+    return "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+
+
+def parse_batch_output(output: str) -> dict[int, dict[str, str]]:
+    """
+    Parse the batch output file and group the responses by content ID.
+
+    Args:
+        output: JSONL output file contents
+
+    Returns:
+        Dictionary mapping content_id to {kind: response text}
+    """
+    results = defaultdict(dict)
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+
+        record = json.loads(line)
+        content_id, kind = record["custom_id"].split(":", 1)
+
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            print(f"  Error for {record['custom_id']}: {record.get('error') or response.get('body')}")
+            continue
+
+        text = response["body"]["choices"][0]["message"]["content"]
+        results[int(content_id)][kind] = text
+
+    return results
+
+
+async def submit_batch(client: AsyncOpenAI, db: aiosqlite.Connection) -> Batch | None:
+    """
+    Submit a batch job analyzing all pending articles.
+
+    Args:
+        client: OpenAI client
+        db: Database connection
+
+    Returns:
+        The submitted batch, or None if there is nothing to analyze
+    """
+    contents = await get_contents_to_analyze(db)
+
+    if not contents:
+        print("No articles to analyze")
+        return None
+
+    print(f"Found {len(contents)} articles to analyze")
+
+    input_file = await client.files.create(
+        file=("analysis.jsonl", build_batch_input(contents)),
+        purpose="batch",
+    )
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window=COMPLETION_WINDOW,
+    )
+    print(f"Submitted batch {batch.id} (resume with --batch-id {batch.id})")
+    return batch
+
+
+async def main(batch_id: str | None = None):
+    """
+    Main batch analysis procedure.
+
+    Args:
+        batch_id: ID of an already submitted batch to resume, if any
+    """
+    print("Starting batch article analysis...")
+
+    client = AsyncOpenAI()
+
+    async with aiosqlite.connect(DB_PATH) as db:
+        await tune(db)
+
+        if batch_id:
+            batch = await client.batches.retrieve(batch_id)
+            print(f"Resuming batch {batch.id} ({batch.status})")
+        else:
+            batch = await submit_batch(client, db)
+            if not batch:
+                return
+
+        while batch.status not in TERMINAL_STATES:
+            await asyncio.sleep(POLL_INTERVAL)
+            batch = await client.batches.retrieve(batch.id)
+            # Request counts aren't available until the input is validated
+            counts = batch.request_counts
+            progress = (
+                f" ({counts.completed}/{counts.total} completed, {counts.failed} failed)"
+                if counts
+                else ""
+            )
+            print(f"Batch {batch.id}: {batch.status}{progress}")
+
+        if batch.status != "completed":
+            print(f"Batch {batch.id} finished with status {batch.status}")
+
+        # Expired and cancelled batches still have an output file holding the
+        # requests that did complete
+        if not batch.output_file_id:
+            return
+
+        output = await client.files.content(batch.output_file_id)
+        results = parse_batch_output(output.text)
+
+        rows = [
+            (content_id, result["article"], result["comments"], result["categories"])
+            for content_id, result in results.items()
+            if all(kind in result for kind in ("article", "comments", "categories"))
+        ]
+
+        await save_analysis_many(db, rows)
+        total_count = batch.request_counts.total // 3 if batch.request_counts else len(results)
+        analyzed_count = len(rows)
+        failed_count = total_count - analyzed_count
+
+        print("\n" + "=" * 60)
+        print("Batch analysis complete!")
+        print(f"Total articles: {total_count}")
+        print(f"Analyzed: {analyzed_count}")
+        print(f"Failed: {failed_count}")
+        print("=" * 60)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Analyze pending articles through the OpenAI Batch API.")
+    parser.add_argument(
+        "--batch-id",
+        help="resume an already submitted batch instead of submitting a new one",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args().batch_id))
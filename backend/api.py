@@ -1,28 +1,39 @@
+import asyncio
+import hashlib
 import os
-import uuid
-import random
+import secrets
 import time
-import json
-from datetime import datetime
+import sqlite3
+from collections.abc import Mapping
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional, List
 from urllib.parse import urlparse
 
 import aiosqlite
 import bcrypt
+import orjson
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel, EmailStr
 from think import LLM, Chat
 
 from constants import CATEGORIES
+from db import ConnectionPool, ensure_indexes, tune, write_transaction
 
 # Load environment variables
 load_dotenv()
 
 # Initialize FastAPI app
-app = FastAPI(title="FTL News API", version="1.0.0")
+app = FastAPI(
+    title="FTL News API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 # Configure CORS
 app.add_middleware(
@@ -31,10 +42,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Database configuration
 DB_PATH = os.getenv("DB_PATH", "data.db")
+DB_READERS = int(os.getenv("DB_READERS", "4"))  # Connections in the read pool
+
+# Category title by slug, for validating topics and naming them in prompts
+CATEGORY_TITLES = {slug: cat_title for slug, cat_title, _ in CATEGORIES}
 
 
 # ============================================================================
@@ -113,96 +129,169 @@ class CategoryResponse(BaseModel):
 # ============================================================================
 
 
+# The article queries are kept as module constants and run on the shared
+# connection, whose statement cache keeps them prepared across requests.
+# Articles matched for a user (list view; no article/comments bodies), one
+# page at a time. Pages are keyed on (score, id) rather than OFFSET, so
+# fetching a page doesn't scan past all the previous ones. Parameters are
+# (user_id, cursor_score, cursor_score, cursor_id, limit); a NULL cursor
+# starts from the top and a limit of -1 returns everything.
+USER_ARTICLES_QUERY = """
+    SELECT
+        l.id,
+        l.title,
+        l.url,
+        l.score,
+        l.descendants,
+        l.hnlink,
+        a.article_summary,
+        a.comments_summary,
+        a.scores,
+        ua.relevance_score
+    FROM user_articles ua
+    JOIN links l ON ua.article_id = l.id
+    LEFT JOIN contents c ON l.id = c.link_id
+    LEFT JOIN analysis a ON c.id = a.content_id
+    WHERE ua.user_id = ?
+        AND ua.matched_categories IS NOT NULL
+        AND ua.matched_categories != '[]'
+        AND (? IS NULL OR (COALESCE(l.score, 0), l.id) < (?, ?))
+    ORDER BY COALESCE(l.score, 0) DESC, l.id DESC
+    LIMIT ?
+"""
+
+# A single matched article for a user, by article ID (same columns as the
+# list view, plus what's needed to mark it as read). The contents join only
+# links the article to its analysis; the article/comments bodies aren't read.
+USER_ARTICLE_QUERY = """
+    SELECT
+        l.id,
+        l.title,
+        l.url,
+        l.score,
+        l.descendants,
+        l.hnlink,
+        a.article_summary,
+        a.comments_summary,
+        a.scores,
+        ua.id as user_article_id,
+        ua.is_read,
+        ua.relevance_score
+    FROM user_articles ua
+    JOIN links l ON ua.article_id = l.id
+    LEFT JOIN contents c ON l.id = c.link_id
+    LEFT JOIN analysis a ON c.id = a.content_id
+    WHERE ua.user_id = ? AND l.id = ?
+        AND ua.matched_categories IS NOT NULL
+        AND ua.matched_categories != '[]'
+"""
+
+
 async def get_db_connection():
-    """Create and return a database connection."""
+    """Create and return a tuned database connection.
+
+    Called only at startup; request handlers never open their own. Reads
+    borrow a connection from `app.state.db_pool`. Writes go through the single
+    shared `app.state.db` connection. Since all writers share its transaction
+    scope, writes run in `write_transaction`, which holds
+    `app.state.db_write_lock` up to and including their commit or rollback so
+    that concurrent requests don't commit or roll back each other's changes.
+    """
     conn = await aiosqlite.connect(DB_PATH)
     conn.row_factory = aiosqlite.Row
+    await tune(conn)
     return conn
 
 
-async def get_all_articles():
-    """Fetch all articles with their content and analysis."""
-    conn = await get_db_connection()
-    try:
-        query = """
-            SELECT
-                l.id,
-                l.hn_id,
-                l.title,
-                l.url,
-                l.score,
-                l.descendants,
-                l.hnlink,
-                c.article,
-                c.comments,
-                a.article_summary,
-                a.comments_summary,
-                a.scores
-            FROM links l
-            LEFT JOIN contents c ON l.id = c.link_id
-            LEFT JOIN analysis a ON c.id = a.content_id
-            ORDER BY l.score DESC
-        """
-        async with conn.execute(query) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
-    finally:
-        await conn.close()
-
-
-async def get_article_by_id(article_id: str):
-    """Fetch a single article by ID."""
-    conn = await get_db_connection()
-    try:
-        query = """
-            SELECT
-                l.id,
-                l.hn_id,
-                l.title,
-                l.url,
-                l.score,
-                l.descendants,
-                l.hnlink,
-                c.article,
-                c.comments,
-                a.article_summary,
-                a.comments_summary,
-                a.scores
-            FROM links l
-            LEFT JOIN contents c ON l.id = c.link_id
-            LEFT JOIN analysis a ON c.id = a.content_id
-            WHERE l.id = ?
-        """
-        async with conn.execute(query, (article_id,)) as cursor:
-            row = await cursor.fetchone()
-            return dict(row) if row else None
-    finally:
-        await conn.close()
-
-
 # ============================================================================
 # Authentication Helpers
 # ============================================================================
 
 
 def generate_token() -> str:
-    """Generate a unique bearer token."""
-    return str(uuid.uuid4())
+    """Generate a unique bearer token (256 bits of randomness)."""
+    return secrets.token_urlsafe(32)
+
+
+def hash_token(token: str) -> str:
+    """Hash a bearer token for storage.
+
+    Only the SHA-256 digest is stored in users.token, so tokens can't be
+    recovered from a database dump, and lookups by digest don't leak timing
+    information about the token itself.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+# Argon2id hasher for new passwords. Accounts created before the switch still
+# have bcrypt hashes ("$2..." prefix); those are verified with bcrypt and
+# rehashed with Argon2id on the next successful login. The cost can be lowered
+# through the environment for local development; hashes made with different
+# parameters are likewise rehashed on login.
+password_hasher = PasswordHasher(
+    time_cost=int(os.getenv("ARGON2_TIME_COST", "2")),
+    memory_cost=int(os.getenv("ARGON2_MEMORY_COST", "65536")),
+    parallelism=1,
+)
+
+# Hash verified against when a login email doesn't exist, so that unknown and
+# known emails take the same time to reject (no user enumeration via timing)
+DUMMY_PASSWORD_HASH = password_hasher.hash(secrets.token_urlsafe(16))
 
 
 def hash_password(password: str) -> str:
-    """Hash password using bcrypt."""
-    password_bytes = password.encode("utf-8")
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    return hashed.decode("utf-8")
+    """Hash password using Argon2id.
+
+    This is CPU-heavy, so call it through `asyncio.to_thread` from endpoints.
+    """
+    return password_hasher.hash(password)
+
+
+def is_bcrypt_hash(hashed_password: str) -> bool:
+    """Check whether a stored hash is a legacy bcrypt hash."""
+    return hashed_password.startswith("$2")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against bcrypt hash."""
-    password_bytes = plain_password.encode("utf-8")
-    hashed_bytes = hashed_password.encode("utf-8")
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+    """Verify password against an Argon2id (or legacy bcrypt) hash.
+
+    This is CPU-heavy, so call it through `asyncio.to_thread` from endpoints.
+    """
+    if is_bcrypt_hash(hashed_password):
+        password_bytes = plain_password.encode("utf-8")
+        hashed_bytes = hashed_password.encode("utf-8")
+        return bcrypt.checkpw(password_bytes, hashed_bytes)
+
+    try:
+        return password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash should be replaced by a fresh Argon2id hash."""
+    return is_bcrypt_hash(hashed_password) or password_hasher.check_needs_rehash(
+        hashed_password
+    )
+
+
+# In-process cache of authenticated users keyed by bearer token, holding
+# (expiry, user) pairs. The TTL is kept short so that deactivated accounts
+# lose access within a minute.
+USER_CACHE_TTL = 60
+USER_CACHE_MAX_SIZE = 10_000
+user_cache: dict[str, tuple[float, dict]] = {}
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop cached entries for a user whose token or profile has changed."""
+    for token in [t for t, (_, user) in user_cache.items() if user["id"] == user_id]:
+        del user_cache[token]
+
+
+def parse_topics(categories: Optional[str]) -> tuple[str, ...]:
+    """Parse the comma-separated category slugs stored on a user."""
+    return tuple(t.strip() for t in (categories or "").split(",") if t.strip())
 
 
 async def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
@@ -215,24 +304,34 @@ async def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
             status_code=401, detail="Invalid authorization header format"
         )
 
-    token = authorization.replace("Bearer ", "")
+    token = authorization.removeprefix("Bearer ")
 
-    # Find user by token in database
-    conn = await get_db_connection()
-    try:
-        query = "SELECT id, email, categories, custom_description, is_active FROM users WHERE token = ?"
-        async with conn.execute(query, (token,)) as cursor:
+    cached = user_cache.get(token)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    # Find user by token in database (users.token is UNIQUE and indexed)
+    query = "SELECT id, email, categories, custom_description, is_active FROM users WHERE token = ?"
+    async with app.state.db_pool.acquire() as conn:
+        async with conn.execute(query, (hash_token(token),)) as cursor:
             row = await cursor.fetchone()
-            if not row:
-                raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-            user = dict(row)
-            if not user["is_active"]:
-                raise HTTPException(status_code=401, detail="Account is inactive")
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    user = dict(row)
+    if not user["is_active"]:
+        raise HTTPException(status_code=401, detail="Account is inactive")
+
+    # Parse the comma-separated categories once; the cached user is reused
+    user["topics"] = parse_topics(user["categories"])
 
-            return user
-    finally:
-        await conn.close()
+    # Evict the oldest entry when full (dicts keep insertion order)
+    if len(user_cache) >= USER_CACHE_MAX_SIZE:
+        del user_cache[next(iter(user_cache))]
+    user_cache[token] = (time.monotonic() + USER_CACHE_TTL, user)
+
+    return user
 
 
 # ============================================================================
@@ -240,47 +339,58 @@ async def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
 # ============================================================================
 
 
+@lru_cache(maxsize=4096)
 def extract_domain(url: str) -> str:
     """Extract domain from URL."""
     if not url:
         return "news.ycombinator.com"
-    try:
-        parsed = urlparse(url)
+
+    # Fast path for the common "scheme://host/..." form
+    scheme_end = url.find("://")
+    if scheme_end > 0 and url[:scheme_end].isalpha():
+        start = scheme_end + 3
+        end = len(url)
+        for separator in "/?#":
+            index = url.find(separator, start, end)
+            if index != -1:
+                end = index
+        domain = url[start:end]
+    else:
+        try:
+            parsed = urlparse(url)
+        except ValueError:  # e.g. malformed IPv6 netloc
+            return "news.ycombinator.com"
         domain = parsed.netloc or parsed.path
-        # Remove www. prefix
-        if domain.startswith("www."):
-            domain = domain[4:]
-        return domain if domain else "news.ycombinator.com"
-    except:
-        return "news.ycombinator.com"
 
+    # Remove www. prefix
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain if domain else "news.ycombinator.com"
 
-def parse_scores_from_json(scores_json: Optional[str]) -> dict:
-    """Parse scores from JSON field and return individual score values."""
-    # Default scores (all 0.0)
-    default_scores = {
+
+# Scores used when an article has no (valid) analysis scores yet
+DEFAULT_SCORES = MappingProxyType(
+    {
         "controversial": 0.0,
         "trustworthy": 0.0,
         "sentiment": 0.0,
         "confidence": 0.0,
     }
+)
 
+
+def parse_scores_from_json(scores_json: Optional[str]) -> Mapping[str, float]:
+    """Parse scores from JSON field and return individual score values."""
     # If no scores data, return defaults
     if not scores_json:
-        return default_scores
+        return DEFAULT_SCORES
 
     try:
-        scores_data = json.loads(scores_json)
-        # Use .get() with default 0.0 for missing keys
-        return {
-            "controversial": scores_data.get("controversial", 0.0),
-            "trustworthy": scores_data.get("trustworthy", 0.0),
-            "sentiment": scores_data.get("sentiment", 0.0),
-            "confidence": scores_data.get("confidence", 0.0),
-        }
-    except (json.JSONDecodeError, AttributeError, TypeError):
-        # If JSON parsing fails, return defaults
-        return default_scores
+        # Missing keys fall back to the defaults
+        return DEFAULT_SCORES | orjson.loads(scores_json)
+    except (orjson.JSONDecodeError, TypeError):
+        # If JSON parsing fails (or isn't an object), return defaults
+        return DEFAULT_SCORES
 
 
 def get_real_scores(scores_json: Optional[str], relevance_score: Optional[float]) -> dict:
@@ -299,62 +409,35 @@ def get_real_scores(scores_json: Optional[str], relevance_score: Optional[float]
     }
 
 
-def map_article_to_response(
-    article_data: dict, user_topics: List[str]
-) -> ArticleResponse:
-    """Map database article to API response format."""
+def map_article_to_response(article_data) -> dict:
+    """Map database article row to API response format (fields of ArticleResponse)."""
     # Get real scores from database
-    scores = get_real_scores(
-        article_data.get("scores"), article_data.get("relevance_score")
-    )
+    scores = get_real_scores(article_data["scores"], article_data["relevance_score"])
 
     # Use analysis summaries if available, otherwise provide placeholder
     article_summary = (
-        article_data.get("article_summary") or "Article summary not yet available."
+        article_data["article_summary"] or "Article summary not yet available."
     )
     comments_summary = (
-        article_data.get("comments_summary") or "Comments summary not yet available."
+        article_data["comments_summary"] or "Comments summary not yet available."
     )
 
-    return ArticleResponse(
-        id=str(article_data["id"]),
-        title=article_data["title"],
-        domain=extract_domain(article_data["url"]),
-        hnScore=article_data["score"] or 0,
-        hnComments=article_data["descendants"] or 0,
-        relevanceScore=scores["relevanceScore"],
-        trustworthinessScore=scores["trustworthinessScore"],
-        controversyScore=scores["controversyScore"],
-        confidenceScore=scores["confidenceScore"],
-        summary=article_summary,
-        commentsSummary=comments_summary,
-        articleUrl=article_data["url"] or article_data["hnlink"],
-        hnUrl=article_data["hnlink"]
+    return {
+        "id": str(article_data["id"]),
+        "title": article_data["title"],
+        "domain": extract_domain(article_data["url"]),
+        "hnScore": article_data["score"] or 0,
+        "hnComments": article_data["descendants"] or 0,
+        "relevanceScore": scores["relevanceScore"],
+        "trustworthinessScore": scores["trustworthinessScore"],
+        "controversyScore": scores["controversyScore"],
+        "confidenceScore": scores["confidenceScore"],
+        "summary": article_summary,
+        "commentsSummary": comments_summary,
+        "articleUrl": article_data["url"] or article_data["hnlink"],
+        "hnUrl": article_data["hnlink"]
         or f"https://news.ycombinator.com/item?id={article_data['id']}",
-    )
-
-
-def filter_articles_by_topics(articles: List[dict], topics: List[str]) -> List[dict]:
-    """Filter articles based on user's selected topics (simple keyword matching)."""
-    if not topics:
-        return articles
-
-    # Get keywords from selected categories
-    category_keywords = set()
-    for slug, cat_title, cat_desc in CATEGORIES:
-        if slug in topics:
-            keywords = cat_title.lower().split() + cat_desc.lower().split()
-            category_keywords.update([k.strip(",.()") for k in keywords if len(k) > 3])
-
-    # Filter articles that contain any of the keywords
-    filtered = []
-    for article in articles:
-        title_lower = article["title"].lower()
-        if any(keyword in title_lower for keyword in category_keywords):
-            filtered.append(article)
-
-    # If no articles match, return top scored articles anyway (fallback)
-    return filtered if filtered else articles[:20]
+    }
 
 
 # ============================================================================
@@ -365,75 +448,66 @@ def filter_articles_by_topics(articles: List[dict], topics: List[str]) -> List[d
 @app.post("/api/auth/register", status_code=201)
 async def register(request: RegisterRequest) -> LoginResponse:
     """Register a new user account."""
-    conn = await get_db_connection()
-    try:
-        # Check if email already exists
-        async with conn.execute(
-            "SELECT id FROM users WHERE email = ?", (request.email,)
-        ) as cursor:
-            if await cursor.fetchone():
-                raise HTTPException(status_code=409, detail="Email already registered")
+    # Generate token and hash password
+    token = generate_token()
+    password_hash = await asyncio.to_thread(hash_password, request.password)
+    current_time = int(time.time())
 
-        # Generate token and hash password
-        token = generate_token()
-        password_hash = hash_password(request.password)
-        current_time = int(time.time())
-
-        # Insert new user
-        await conn.execute(
-            """
-            INSERT INTO users (email, password_hash, token, is_active, is_email_verified,
-                             categories, custom_description, created_at, updated_at)
-            VALUES (?, ?, ?, 1, 1, '', '', ?, ?)
-            """,
-            (request.email, password_hash, token, current_time, current_time),
-        )
-        await conn.commit()
+    # Insert new user, relying on the UNIQUE constraint on users.email to
+    # reject duplicates (no separate lookup, and no check-then-insert race)
+    try:
+        async with write_transaction(app.state.db, app.state.db_write_lock) as conn:
+            await conn.execute(
+                """
+                INSERT INTO users (email, password_hash, token, is_active, is_email_verified,
+                                 categories, custom_description, created_at, updated_at)
+                VALUES (?, ?, ?, 1, 1, '', '', ?, ?)
+                """,
+                (request.email, password_hash, hash_token(token), current_time, current_time),
+            )
+    except sqlite3.IntegrityError:
+        raise HTTPException(status_code=409, detail="Email already registered")
 
-        return LoginResponse(token=token)
-    finally:
-        await conn.close()
+    return LoginResponse(token=token)
 
 
 @app.post("/api/auth/login")
 async def login(request: LoginRequest) -> LoginResponse:
     """Authenticate user and return bearer token."""
-    conn = await get_db_connection()
-    try:
-        # Find user by email
+    # Find user by email
+    async with app.state.db_pool.acquire() as conn:
         async with conn.execute(
             "SELECT id, password_hash, is_active FROM users WHERE email = ?",
             (request.email,),
         ) as cursor:
             row = await cursor.fetchone()
 
-        if not row:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-
-        user = dict(row)
-
-        # Check if account is active
-        if not user["is_active"]:
-            raise HTTPException(status_code=401, detail="Account is inactive")
-
-        # Verify password
-        if not verify_password(request.password, user["password_hash"]):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-
-        # Generate new token
-        token = generate_token()
-        current_time = int(time.time())
-
-        # Update user's token
+    # Verify password (off the event loop, hashing takes tens of milliseconds).
+    # The hash is always verified, against a dummy one for unknown emails, and
+    # unknown, inactive and wrong-password logins get the same response, so
+    # neither timing nor the message reveals which accounts exist.
+    password_hash = row["password_hash"] if row else DUMMY_PASSWORD_HASH
+    password_ok = await asyncio.to_thread(verify_password, request.password, password_hash)
+    if not (row and row["is_active"] and password_ok):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Upgrade legacy bcrypt (or outdated Argon2) hashes now that we know the password
+    if password_needs_rehash(password_hash):
+        password_hash = await asyncio.to_thread(hash_password, request.password)
+
+    # Generate new token
+    token = generate_token()
+    current_time = int(time.time())
+
+    # Update user's token
+    async with write_transaction(app.state.db, app.state.db_write_lock) as conn:
         await conn.execute(
-            "UPDATE users SET token = ?, updated_at = ? WHERE id = ?",
-            (token, current_time, user["id"]),
+            "UPDATE users SET token = ?, password_hash = ?, updated_at = ? WHERE id = ?",
+            (hash_token(token), password_hash, current_time, row["id"]),
         )
-        await conn.commit()
+    invalidate_cached_user(row["id"])
 
-        return LoginResponse(token=token)
-    finally:
-        await conn.close()
+    return LoginResponse(token=token)
 
 
 # ============================================================================
@@ -446,11 +520,8 @@ async def get_profile(
     current_user: dict = Depends(get_current_user),
 ) -> ProfileResponse:
     """Fetch user profile and preferences."""
-    # Parse categories from comma-separated string
-    topics = [t.strip() for t in current_user["categories"].split(",") if t.strip()]
-
     return ProfileResponse(
-        topics=topics,
+        topics=current_user["topics"],
         customDescription=current_user["custom_description"] or "",
     )
 
@@ -464,20 +535,18 @@ async def update_profile(
         raise HTTPException(status_code=400, detail="At least one topic is required")
 
     # Validate topics against available categories
-    valid_slugs = {slug for slug, _, _ in CATEGORIES}
-    invalid_topics = [t for t in request.topics if t not in valid_slugs]
+    invalid_topics = [t for t in request.topics if t not in CATEGORY_TITLES]
     if invalid_topics:
         raise HTTPException(
             status_code=400, detail=f"Invalid topics: {', '.join(invalid_topics)}"
         )
 
     # Update user profile in database
-    conn = await get_db_connection()
-    try:
-        # Convert topics list to comma-separated string
-        categories_str = ",".join(request.topics)
-        current_time = int(time.time())
+    # Convert topics list to comma-separated string
+    categories_str = ",".join(request.topics)
+    current_time = int(time.time())
 
+    async with write_transaction(app.state.db, app.state.db_write_lock) as conn:
         await conn.execute(
             "UPDATE users SET categories = ?, custom_description = ?, updated_at = ? WHERE id = ?",
             (
@@ -487,11 +556,9 @@ async def update_profile(
                 current_user["id"],
             ),
         )
-        await conn.commit()
+    invalidate_cached_user(current_user["id"])
 
-        return {"message": "Profile updated successfully"}
-    finally:
-        await conn.close()
+    return {"message": "Profile updated successfully"}
 
 
 # ============================================================================
@@ -499,13 +566,19 @@ async def update_profile(
 # ============================================================================
 
 
-@app.get("/api/categories/")
-async def get_categories() -> List[CategoryResponse]:
-    """Fetch all available categories."""
-    return [
-        CategoryResponse(slug=slug, title=title, description=description)
+# CATEGORIES never changes, so the response body is serialized once
+CATEGORIES_RESPONSE_BODY = orjson.dumps(
+    [
+        {"slug": slug, "title": title, "description": description}
         for slug, title, description in CATEGORIES
     ]
+)
+
+
+@app.get("/api/categories/", response_model=List[CategoryResponse])
+async def get_categories() -> Response:
+    """Fetch all available categories."""
+    return Response(CATEGORIES_RESPONSE_BODY, media_type="application/json")
 
 
 # ============================================================================
@@ -513,52 +586,55 @@ async def get_categories() -> List[CategoryResponse]:
 # ============================================================================
 
 
-@app.get("/api/articles/")
+@app.get("/api/articles/", response_model=List[ArticleResponse])
 async def get_articles(
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
-) -> List[ArticleResponse]:
-    """Fetch all articles personalized for the user."""
-    # Parse user's topics from categories field
-    user_topics = [
-        t.strip() for t in current_user["categories"].split(",") if t.strip()
-    ]
-
-    # Fetch articles that are available to this user from user_articles table
-    conn = await get_db_connection()
-    try:
-        query = """
-            SELECT
-                l.id,
-                l.hn_id,
-                l.title,
-                l.url,
-                l.score,
-                l.descendants,
-                l.hnlink,
-                c.article,
-                c.comments,
-                a.article_summary,
-                a.comments_summary,
-                a.scores,
-                ua.is_read,
-                ua.relevance_score
-            FROM user_articles ua
-            JOIN links l ON ua.article_id = l.id
-            LEFT JOIN contents c ON l.id = c.link_id
-            LEFT JOIN analysis a ON c.id = a.content_id
-            WHERE ua.user_id = ?
-                AND ua.matched_categories IS NOT NULL
-                AND ua.matched_categories != '[]'
-            ORDER BY l.score DESC
-        """
-        async with conn.execute(query, (current_user["id"],)) as cursor:
-            rows = await cursor.fetchall()
-            articles = [dict(row) for row in rows]
-    finally:
-        await conn.close()
-
-    # Map to response format
-    return [map_article_to_response(article, user_topics) for article in articles]
+) -> Response:
+    """Fetch articles personalized for the user, highest scored first.
+
+    Without `limit` all articles are returned. With it, a single page is
+    returned, and if there may be more the `X-Next-Cursor` response header
+    holds the `cursor` value for the next page.
+
+    Responses carry an ETag; a request whose `If-None-Match` matches the
+    current list gets an empty 304 instead.
+    """
+    cursor_score = cursor_id = None
+    if cursor:
+        try:
+            cursor_score, cursor_id = (int(part) for part in cursor.split(":"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Fetch articles that are available to this user from user_articles table.
+    # Only the columns used by the response are selected; the article and
+    # comments bodies are large and not part of the list view.
+    params = (current_user["id"], cursor_score, cursor_score, cursor_id, limit or -1)
+    async with app.state.db_pool.acquire() as conn:
+        async with conn.execute(USER_ARTICLES_QUERY, params) as db_cursor:
+            rows = await db_cursor.fetchall()
+
+    # The dicts are serialized by orjson directly, skipping per-article
+    # pydantic validation (response_model is only used for the OpenAPI schema).
+    body = orjson.dumps([map_article_to_response(row) for row in rows])
+
+    # The list depends on user_articles, links and analysis, none of which
+    # track modification times, so the ETag is a hash of the body itself.
+    # no-cache makes browsers revalidate (If-None-Match) on every load.
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if limit and len(rows) == limit:
+        last = rows[-1]
+        headers["X-Next-Cursor"] = f"{last['score'] or 0}:{last['id']}"
+
+    if if_none_match:
+        client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in client_etags:
+            return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/articles/{article_id}/")
@@ -566,60 +642,26 @@ async def get_article(
     article_id: str, current_user: dict = Depends(get_current_user)
 ) -> ArticleResponse:
     """Fetch detailed information for a specific article."""
-    # Parse user's topics from categories field
-    user_topics = [
-        t.strip() for t in current_user["categories"].split(",") if t.strip()
-    ]
-
-    conn = await get_db_connection()
-    try:
-        # Check if user has access to this article via user_articles
-        query = """
-            SELECT
-                l.id,
-                l.hn_id,
-                l.title,
-                l.url,
-                l.score,
-                l.descendants,
-                l.hnlink,
-                c.article,
-                c.comments,
-                a.article_summary,
-                a.comments_summary,
-                a.scores,
-                ua.id as user_article_id,
-                ua.is_read,
-                ua.relevance_score
-            FROM user_articles ua
-            JOIN links l ON ua.article_id = l.id
-            LEFT JOIN contents c ON l.id = c.link_id
-            LEFT JOIN analysis a ON c.id = a.content_id
-            WHERE ua.user_id = ? AND l.id = ?
-                AND ua.matched_categories IS NOT NULL
-                AND ua.matched_categories != '[]'
-        """
-        async with conn.execute(query, (current_user["id"], article_id)) as cursor:
+    # Check if user has access to this article via user_articles
+    async with app.state.db_pool.acquire() as conn:
+        async with conn.execute(USER_ARTICLE_QUERY, (current_user["id"], article_id)) as cursor:
             row = await cursor.fetchone()
 
-        if not row:
-            raise HTTPException(
-                status_code=404, detail="Article not found or not accessible"
-            )
-
-        article = dict(row)
+    if not row:
+        raise HTTPException(
+            status_code=404, detail="Article not found or not accessible"
+        )
 
-        # Mark article as read if not already read
-        if not article["is_read"]:
+    # Mark article as read if not already read. The is_read = 0 guard keeps
+    # the update idempotent if another request marked it in the meantime.
+    if not row["is_read"]:
+        async with write_transaction(app.state.db, app.state.db_write_lock) as conn:
             await conn.execute(
-                "UPDATE user_articles SET is_read = 1 WHERE id = ?",
-                (article["user_article_id"],),
+                "UPDATE user_articles SET is_read = 1 WHERE id = ? AND is_read = 0",
+                (row["user_article_id"],),
             )
-            await conn.commit()
 
-        return map_article_to_response(article, user_topics)
-    finally:
-        await conn.close()
+    return map_article_to_response(row)
 
 
 # ============================================================================
@@ -627,17 +669,39 @@ async def get_article(
 # ============================================================================
 
 
+def split_paragraphs(text: str, separator: str, limit: int) -> List[str]:
+    """Return up to `limit` non-empty, stripped pieces of text split by separator.
+
+    Stops scanning once enough pieces are found, so only the start of a long
+    article is ever looked at.
+    """
+    pieces = []
+    start = 0
+    while len(pieces) < limit:
+        end = text.find(separator, start)
+        piece = (text[start:] if end == -1 else text[start:end]).strip()
+        if piece:
+            pieces.append(piece)
+        if end == -1:
+            break
+        start = end + len(separator)
+    return pieces
+
+
 def truncate_article(article_text: str, paragraphs: int = 5) -> str:
     """Truncate article to first N paragraphs."""
     if not article_text:
         return ""
 
+    # One piece more than needed tells us whether there's more to the article
+    limit = max(paragraphs, 1) + 1
+
     # Split by double newlines (paragraphs) or single newlines if no paragraphs
-    paragraphs_list = [p.strip() for p in article_text.split("\n\n") if p.strip()]
+    paragraphs_list = split_paragraphs(article_text, "\n\n", limit)
 
     if len(paragraphs_list) < 2:
         # Try splitting by single newlines
-        paragraphs_list = [p.strip() for p in article_text.split("\n") if p.strip()]
+        paragraphs_list = split_paragraphs(article_text, "\n", limit)
 
     # Take first N paragraphs
     selected = paragraphs_list[:paragraphs]
@@ -650,32 +714,42 @@ def truncate_article(article_text: str, paragraphs: int = 5) -> str:
     return truncated
 
 
+@lru_cache(maxsize=128)
 def build_system_prompt(
     article_title: str,
     article_summary: str,
-    article_text: str,
+    article_excerpt: str,
     comments_summary: str,
-    user_categories: str,
+    user_topics: tuple[str, ...],
     user_custom_description: str,
 ) -> str:
-    """Build the system prompt for the chatbot."""
-    # Parse categories
-    categories = [c.strip() for c in user_categories.split(",") if c.strip()]
-    category_names = []
-    for slug in categories:
-        for cat_slug, cat_title, _ in CATEGORIES:
-            if cat_slug == slug:
-                category_names.append(cat_title)
-                break
-
-    # Build the prompt
+    """Build the system prompt for the chatbot.
+
+    Cached, since every turn of a conversation builds the same prompt. The key
+    covers all inputs, so a profile update simply misses the cache. Callers
+    pass the truncated article (see `truncate_article`), not the whole body,
+    to keep cached keys small.
+    """
+    category_names = [CATEGORY_TITLES[slug] for slug in user_topics if slug in CATEGORY_TITLES]
+
+    # Build the prompt. The static instructions go first so that the prompt
+    # prefix is identical across all chats and can be cached by the provider.
     prompt = f"""You are a helpful AI assistant helping users understand and discuss HackerNews articles.
 
+Your role is to:
+1. Help the user understand the article and its implications
+2. Answer questions about the article content and related topics
+3. Provide context from the HackerNews discussion when relevant
+4. Relate the topic to the user's interests when appropriate
+5. Be concise in your answers.
+
+Keep responses focused and relevant. If the user asks about something not covered in the article, you can use your general knowledge but always clarify what comes from the article vs. your general knowledge.
+
 ARTICLE INFORMATION:
 Title: {article_title}
 Summary: {article_summary}
 
-{truncate_article(article_text, paragraphs=5)}
+{article_excerpt}
 
 DISCUSSION CONTEXT:
 The HackerNews community discussed this article. Here's a summary of the key points from the comments:
@@ -687,17 +761,6 @@ The user is interested in the following topics: {', '.join(category_names) if ca
     if user_custom_description:
         prompt += f"\nUser's specific interests: {user_custom_description}"
 
-    prompt += """
-
-Your role is to:
-1. Help the user understand the article and its implications
-2. Answer questions about the article content and related topics
-3. Provide context from the HackerNews discussion when relevant
-4. Relate the topic to the user's interests when appropriate
-5. Be concise in your answers.
-
-Keep responses focused and relevant. If the user asks about something not covered in the article, you can use your general knowledge but always clarify what comes from the article vs. your general knowledge."""
-
     return prompt
 
 
@@ -706,13 +769,12 @@ Keep responses focused and relevant. If the user asks about something not covere
 # ============================================================================
 
 
-@app.get("/api/articles/{article_id}/chat/")
+@app.get("/api/articles/{article_id}/chat/", response_model=List[ChatMessage])
 async def get_chat_history(
     article_id: str, current_user: dict = Depends(get_current_user)
-) -> List[ChatMessage]:
+) -> ORJSONResponse:
     """Fetch chat history for a specific article."""
-    conn = await get_db_connection()
-    try:
+    async with app.state.db_pool.acquire() as conn:
         # Get user_article_id for this user and article
         async with conn.execute(
             "SELECT id FROM user_articles WHERE user_id = ? AND article_id = ?",
@@ -736,19 +798,20 @@ async def get_chat_history(
         """
         async with conn.execute(query, (user_article_id,)) as cursor:
             rows = await cursor.fetchall()
-            messages = [
-                ChatMessage(
-                    id=str(row["id"]),
-                    role=row["role"],
-                    content=row["content"],
-                    timestamp=row["timestamp"],
-                )
-                for row in rows
-            ]
 
-        return messages
-    finally:
-        await conn.close()
+    # Like get_articles, build plain dicts for orjson instead of validating
+    # a ChatMessage model per row
+    return ORJSONResponse(
+        [
+            {
+                "id": str(row["id"]),
+                "role": row["role"],
+                "content": row["content"],
+                "timestamp": row["timestamp"],
+            }
+            for row in rows
+        ]
+    )
 
 
 @app.post("/api/articles/{article_id}/chat/send")
@@ -758,104 +821,97 @@ async def send_chat_message(
     current_user: dict = Depends(get_current_user),
 ) -> ChatResponse:
     """Send a chat message and receive AI response."""
-    conn = await get_db_connection()
-    try:
-        # Get user_article_id and full article context
-        query = """
-            SELECT
-                ua.id as user_article_id,
-                l.title,
-                c.article,
-                a.article_summary,
-                a.comments_summary
-            FROM user_articles ua
-            JOIN links l ON ua.article_id = l.id
-            LEFT JOIN contents c ON l.id = c.link_id
-            LEFT JOIN analysis a ON c.id = a.content_id
-            WHERE ua.user_id = ? AND ua.article_id = ?
-        """
+    # Get user_article_id, full article context and the conversation history
+    # (as a JSON array of [role, content] pairs) in a single query
+    query = """
+        SELECT
+            ua.id as user_article_id,
+            l.title,
+            c.article,
+            a.article_summary,
+            a.comments_summary,
+            (
+                SELECT json_group_array(json_array(role, content))
+                FROM (
+                    SELECT role, content
+                    FROM messages
+                    WHERE user_article_id = ua.id
+                    ORDER BY timestamp ASC
+                )
+            ) as history
+        FROM user_articles ua
+        JOIN links l ON ua.article_id = l.id
+        LEFT JOIN contents c ON l.id = c.link_id
+        LEFT JOIN analysis a ON c.id = a.content_id
+        WHERE ua.user_id = ? AND ua.article_id = ?
+    """
+    async with app.state.db_pool.acquire() as conn:
         async with conn.execute(query, (current_user["id"], article_id)) as cursor:
             row = await cursor.fetchone()
 
-        if not row:
-            raise HTTPException(
-                status_code=404, detail="Article not found or not accessible"
-            )
-
-        user_article_id = row["user_article_id"]
-        article_title = row["title"]
-        article_text = row["article"] or ""
-        article_summary = row["article_summary"] or "No summary available."
-        comments_summary = row["comments_summary"] or "No comments summary available."
-
-        # Fetch conversation history
-        history_query = """
-            SELECT role, content
-            FROM messages
-            WHERE user_article_id = ?
-            ORDER BY timestamp ASC
-        """
-        async with conn.execute(history_query, (user_article_id,)) as cursor:
-            history_rows = await cursor.fetchall()
-            conversation_history = [dict(row) for row in history_rows]
-
-        # Build system prompt
-        system_prompt = build_system_prompt(
-            article_title=article_title,
-            article_summary=article_summary,
-            article_text=article_text,
-            comments_summary=comments_summary,
-            user_categories=current_user["categories"],
-            user_custom_description=current_user["custom_description"],
+    if not row:
+        raise HTTPException(
+            status_code=404, detail="Article not found or not accessible"
         )
 
-        # Build Chat object with history
-        chat = Chat(system_prompt)
+    user_article_id = row["user_article_id"]
+    article_title = row["title"]
+    article_text = row["article"] or ""
+    article_summary = row["article_summary"] or "No summary available."
+    comments_summary = row["comments_summary"] or "No comments summary available."
+    history_rows = orjson.loads(row["history"])
+
+    # Build system prompt
+    system_prompt = build_system_prompt(
+        article_title=article_title,
+        article_summary=article_summary,
+        article_excerpt=truncate_article(article_text, paragraphs=5),
+        comments_summary=comments_summary,
+        user_topics=current_user["topics"],
+        user_custom_description=current_user["custom_description"],
+    )
 
-        # Add conversation history
-        for msg in conversation_history:
-            if msg["role"] == "user":
-                chat.user(msg["content"])
-            elif msg["role"] == "assistant":
-                chat.assistant(msg["content"])
+    # Build Chat object with history
+    chat = Chat(system_prompt)
 
-        # Add new user message
-        chat.user(request.message)
+    # Add conversation history
+    for role, content in history_rows:
+        if role == "user":
+            chat.user(content)
+        elif role == "assistant":
+            chat.assistant(content)
 
-        # Get LLM response
-        if not app.state.llm:
-            raise HTTPException(
-                status_code=503,
-                detail="AI service not available. Please configure OPENAI_API_KEY environment variable.",
-            )
+    # Add new user message
+    chat.user(request.message)
 
-        try:
-            ai_response_text = await app.state.llm(chat)
-        except Exception as e:
-            # Log error and provide fallback response
-            print(f"LLM error: {e}")
-            raise HTTPException(
-                status_code=500, detail="Failed to generate AI response"
-            )
+    # Get LLM response
+    if not app.state.llm:
+        raise HTTPException(
+            status_code=503,
+            detail="AI service not available. Please configure OPENAI_API_KEY environment variable.",
+        )
 
-        # Store user message
-        current_timestamp = int(datetime.now().timestamp() * 1000)
-        await conn.execute(
-            "INSERT INTO messages (user_article_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-            (user_article_id, "user", request.message, current_timestamp),
+    try:
+        ai_response_text = await app.state.llm(chat)
+    except Exception as e:
+        # Log error and provide fallback response
+        print(f"LLM error: {e}")
+        raise HTTPException(
+            status_code=500, detail="Failed to generate AI response"
         )
 
-        # Store AI response
-        await conn.execute(
+    # Store user message and AI response in one statement and commit
+    current_timestamp = time.time_ns() // 1_000_000
+    async with write_transaction(app.state.db, app.state.db_write_lock) as conn:
+        await conn.executemany(
             "INSERT INTO messages (user_article_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-            (user_article_id, "assistant", ai_response_text, current_timestamp + 1),
+            [
+                (user_article_id, "user", request.message, current_timestamp),
+                (user_article_id, "assistant", ai_response_text, current_timestamp + 1),
+            ],
         )
 
-        await conn.commit()
-
-        return ChatResponse(response=ai_response_text)
-    finally:
-        await conn.close()
+    return ChatResponse(response=ai_response_text)
 
 
 # ============================================================================
@@ -866,7 +922,7 @@ async def send_chat_message(
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Handle HTTP exceptions with consistent JSON format."""
-    return JSONResponse(status_code=exc.status_code, content={"error": exc.detail})
+    return ORJSONResponse(status_code=exc.status_code, content={"error": exc.detail})
 
 
 # ============================================================================
@@ -881,6 +937,14 @@ async def startup_event():
     print(f"Database: {DB_PATH}")
     print(f"Database-backed authentication enabled")
 
+    # Open the shared write connection and the pool of read connections
+    app.state.db = await get_db_connection()
+    await ensure_indexes(app.state.db)
+    app.state.db_write_lock = asyncio.Lock()
+    app.state.db_pool = ConnectionPool(
+        [await get_db_connection() for _ in range(DB_READERS)]
+    )
+
     # Initialize LLM for chatbot
     api_key = os.getenv("OPENAI_API_KEY")
     if api_key:
@@ -889,3 +953,10 @@ async def startup_event():
     else:
         app.state.llm = None
         print("WARNING: OPENAI_API_KEY not set - chatbot will not work")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release resources on shutdown."""
+    await app.state.db_pool.close()
+    await app.state.db.close()
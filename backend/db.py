@@ -0,0 +1,108 @@
+"""
+Shared SQLite connection settings.
+"""
+
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiosqlite
+
+# WAL lets readers proceed while a writer is active; with WAL, synchronous=NORMAL
+# is still durable across application crashes and avoids an fsync per commit.
+PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA busy_timeout=5000;
+"""
+
+
+async def tune(conn: aiosqlite.Connection) -> None:
+    """Apply the performance PRAGMAs to a freshly opened connection."""
+    await conn.executescript(PRAGMAS)
+
+
+# Indexes used by the hot query paths. Created on startup (if missing) so that
+# databases created before they were added to schema.sql get them too.
+# The partial user_articles index only holds the rows matched to the user, so
+# the article list never visits (or reads) the unmatched ones.
+# Lookups by users.email, users.token and user_articles(user_id, article_id)
+# use the automatic indexes behind their UNIQUE constraints, so the separate
+# indexes that duplicated them (and slowed down every write) are dropped.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_contents_link ON contents(link_id);
+DROP INDEX IF EXISTS idx_messages_user_article;
+CREATE INDEX IF NOT EXISTS idx_messages_user_article_timestamp ON messages(user_article_id, timestamp);
+DROP INDEX IF EXISTS idx_users_email;
+DROP INDEX IF EXISTS idx_users_token;
+DROP INDEX IF EXISTS idx_user_articles_user;
+CREATE INDEX IF NOT EXISTS idx_user_articles_user_matched ON user_articles(user_id, article_id)
+    WHERE matched_categories IS NOT NULL AND matched_categories != '[]';
+"""
+
+
+# At most one analysis per content. Databases holding duplicate analyses from
+# before it was added can't get it until they are cleaned up by migrate.py.
+ANALYSIS_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_analysis_content ON analysis(content_id)"
+
+
+async def ensure_indexes(conn: aiosqlite.Connection) -> None:
+    """Create any missing hot-path indexes."""
+    await conn.executescript(INDEXES)
+    try:
+        await conn.execute(ANALYSIS_INDEX)
+    except sqlite3.IntegrityError:
+        print("WARNING: duplicate analyses found, run migrate.py to add idx_analysis_content")
+
+
+@asynccontextmanager
+async def write_transaction(
+    conn: aiosqlite.Connection, lock: asyncio.Lock
+) -> AsyncIterator[aiosqlite.Connection]:
+    """
+    Run a write on a shared connection as one transaction, holding its lock.
+
+    Commits if the block succeeds. If the block (or the commit) raises, rolls
+    back before re-raising, so a failed write can't leave partial changes in
+    the open transaction for the next writer to commit.
+    """
+    async with lock:
+        try:
+            yield conn
+            await conn.commit()
+        except BaseException:
+            await conn.rollback()
+            raise
+
+
+class ConnectionPool:
+    """
+    A fixed set of open connections, each used by one caller at a time.
+
+    Every aiosqlite connection runs its queries on its own thread, one after
+    another. Spreading reads over a few connections lets them run
+    concurrently; with WAL they don't block (or get blocked by) the writer.
+    """
+
+    def __init__(self, connections: list[aiosqlite.Connection]):
+        self.connections = connections
+        self.idle = asyncio.Queue()
+        for conn in connections:
+            self.idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a connection, waiting for one to be returned if all are in use."""
+        conn = await self.idle.get()
+        try:
+            yield conn
+        finally:
+            self.idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        """Close all connections in the pool."""
+        for conn in self.connections:
+            await conn.close()
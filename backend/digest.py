@@ -10,14 +10,19 @@ Usage:
     uv run python digest.py
 """
 
-import json
 import sqlite3
 from os import environ
 from logging import getLogger, basicConfig, INFO
-from typing import List, Dict, Any
-from collections import defaultdict
+from typing import List, Dict, Any, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 
+import orjson
 from dotenv import load_dotenv
+from jinja2 import Environment
+
 import mail
 
 # Load environment variables
@@ -31,61 +36,129 @@ log = getLogger(__name__)
 DB_PATH = environ.get("DB_PATH", "../data/db.sqlite")
 APP_BASE_URL = environ.get("APP_BASE_URL", "http://localhost:3000")
 
+# Number of digests sent concurrently; keep the resulting send rate within the
+# SES account's sending quota
+DIGEST_SEND_WORKERS = int(environ.get("DIGEST_SEND_WORKERS", "4"))
 
-def get_db_connection():
-    """Create and return a database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    return conn
+# Max IDs per "IN (...)" clause, below SQLite's default limit on bound
+# parameters in older versions (999)
+MAX_SQL_VARIABLES = 900
 
 
-def get_users_with_unsent_articles() -> Dict[int, Dict[str, Any]]:
+# Digest email template, compiled once. Autoescaping keeps article titles and
+# summaries from injecting markup into the email.
+DIGEST_TEMPLATE = Environment(autoescape=True).from_string(
     """
-    Fetch all active users who have unsent articles.
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Your Personalized Article Digest</title>
+    </head>
+    <body style="margin: 0; padding: 0; background-color: #f5f5f5; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <!-- Header -->
+            <div style="background-color: #1a1a1a; color: white; padding: 30px 20px;
+                        border-radius: 8px 8px 0 0; text-align: center;">
+                <h1 style="margin: 0; font-size: 28px; font-weight: 600;">
+                    Your Personalized Article Digest
+                </h1>
+                <p style="margin: 10px 0 0; font-size: 16px; opacity: 0.9;">
+                    {{ articles|length }} new article{{ "s" if articles|length != 1 }} selected for you
+                </p>
+            </div>
 
-    Returns:
-        Dictionary mapping user_id to user data (email, categories, etc.)
-    """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+            <!-- Content -->
+            <div style="background-color: #f9f9f9; padding: 20px; border-radius: 0 0 8px 8px;">
+                <p style="color: #4a4a4a; line-height: 1.6; margin-top: 0;">
+                    Hi! Here are your latest personalized articles based on your interests.
+                </p>
 
-    query = """
-        SELECT DISTINCT u.id, u.email, u.categories, u.custom_description
-        FROM users u
-        JOIN user_articles ua ON u.id = ua.user_id
-        WHERE u.is_active = 1 AND ua.is_sent = 0
-        ORDER BY u.id
+                {% for article in articles %}
+        <div style="background-color: #ffffff; border: 1px solid #e0e0e0; border-radius: 8px;
+                    padding: 20px; margin-bottom: 20px;">
+            <div style="margin-bottom: 8px;">
+                <span style="background-color: #ff6b35; color: white; padding: 4px 10px;
+                             border-radius: 4px; font-size: 12px; font-weight: bold;">
+                    Score: {{ article.score }}
+                </span>
+            </div>
+
+            <h2 style="margin: 12px 0; font-size: 20px; line-height: 1.4;">
+                <a href="{{ article.link }}" style="color: #1a1a1a; text-decoration: none;">
+                    {{ article.title }}
+                </a>
+            </h2>
+
+            {% if article.categories %}<div style="margin: 12px 0;">
+                {%- for category in article.categories -%}
+                <span style="display: inline-block; background-color: #e8f4f8; color: #0066cc; padding: 4px 8px; border-radius: 4px; font-size: 12px; margin-right: 4px; margin-bottom: 4px;">{{ category }}</span>
+                {%- endfor -%}
+            </div>{% endif %}
+
+            {% if article.summary %}<p style="color: #4a4a4a; line-height: 1.6; margin: 12px 0;">{{ article.summary }}</p>{% endif %}
+
+            <div style="margin-top: 12px;">
+                <a href="{{ article.link }}"
+                   style="color: #0066cc; text-decoration: none; font-weight: 500; margin-right: 16px;">
+                    Read Article &rarr;
+                </a>
+            </div>
+        </div>
+                {% endfor %}
+
+                <!-- Footer -->
+                <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #e0e0e0;
+                            text-align: center; color: #666666; font-size: 14px;">
+                    <p style="margin: 0 0 10px;">
+                        This digest was sent to {{ user_email }}
+                    </p>
+                    <p style="margin: 0;">
+                        <a href="{{ app_base_url }}/profile"
+                           style="color: #0066cc; text-decoration: none;">
+                            Manage your preferences
+                        </a>
+                    </p>
+                </div>
+            </div>
+        </div>
+    </body>
+    </html>
     """
+)
 
-    cursor.execute(query)
-    users = {}
-    for row in cursor.fetchall():
-        users[row["id"]] = {
-            "email": row["email"],
-            "categories": row["categories"],
-            "custom_description": row["custom_description"],
-        }
 
-    conn.close()
-    log.info(f"Found {len(users)} users with unsent articles")
-    return users
+def get_db_connection():
+    """Create and return a database connection."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    return conn
 
 
-def get_unsent_articles_for_user(user_id: int) -> List[Dict[str, Any]]:
+def get_unsent_digests(
+    conn: sqlite3.Connection,
+) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, List[Dict[str, Any]]]]:
     """
-    Fetch all unsent articles for a specific user with article details.
+    Fetch all active users with unsent articles, together with those articles.
+
+    Runs a single query for all users (instead of one per user) and groups the
+    rows by user.
 
     Args:
-        user_id: The user's ID
+        conn: Database connection
 
     Returns:
-        List of article dictionaries with full details
+        Tuple of (users, articles): users maps user_id to user data (email,
+        categories, etc.), articles maps user_id to a list of article
+        dictionaries with full details, most relevant first
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     query = """
         SELECT
+            u.id as user_id,
+            u.email,
+            u.categories,
+            u.custom_description,
             ua.id as user_article_id,
             l.id as article_id,
             l.title,
@@ -95,206 +168,163 @@ def get_unsent_articles_for_user(user_id: int) -> List[Dict[str, Any]]:
             a.comments_summary,
             ua.relevance_score,
             ua.matched_categories
-        FROM user_articles ua
+        FROM users u
+        JOIN user_articles ua ON u.id = ua.user_id
         JOIN links l ON ua.article_id = l.id
         LEFT JOIN contents c ON l.id = c.link_id
         LEFT JOIN analysis a ON c.id = a.content_id
-        WHERE ua.user_id = ? AND ua.is_sent = 0
+        WHERE u.is_active = 1 AND ua.is_sent = 0
             AND ua.matched_categories IS NOT NULL
             AND ua.matched_categories != '[]'
-        ORDER BY ua.relevance_score DESC
+        ORDER BY u.id, ua.relevance_score DESC
     """
 
-    cursor.execute(query, (user_id,))
-    articles = [dict(row) for row in cursor.fetchall()]
+    users = {}
+    articles = {}
+    rows = conn.execute(query)
+    for user_id, user_rows in groupby(rows, key=itemgetter("user_id")):
+        user_articles = [dict(row) for row in user_rows]
+        first = user_articles[0]
+        users[user_id] = {
+            "email": first["email"],
+            "categories": first["categories"],
+            "custom_description": first["custom_description"],
+        }
+        articles[user_id] = user_articles
 
-    conn.close()
-    log.info(f"Found {len(articles)} unsent articles for user {user_id}")
-    return articles
+    log.info(f"Found {len(users)} users with unsent articles")
+    return users, articles
 
 
-def generate_html_email(user_email: str, articles: List[Dict[str, Any]]) -> str:
+@lru_cache(maxsize=1024)
+def format_categories(matched_categories: str) -> Tuple[str, ...]:
     """
-    Generate HTML email content for the digest.
+    Format matched categories (a JSON list of slugs) as tag labels.
+
+    Cached, since the same few combinations of categories repeat across
+    articles and users.
 
     Args:
-        user_email: User's email address
-        articles: List of article dictionaries
+        matched_categories: JSON list of matched category slugs
 
     Returns:
-        HTML string for the email body
+        Display names of (at most) the first 3 categories
     """
-    # Build article cards HTML
-    article_cards = []
-    for article in articles:
-        title = article.get("title", "Untitled Article")
-        url = article.get("url", "#")
-        hnlink = article.get("hnlink", "#")
-        article_id = article.get("article_id", 0)
-        relevance_score = article.get("relevance_score", 0)
-        matched_categories = article.get("matched_categories", "")
-        summary = article.get("article_summary", "")
+    try:
+        return tuple(
+            cat.strip().replace("-", " ").title()
+            for cat in orjson.loads(matched_categories)[:3]
+        )
+    except (orjson.JSONDecodeError, TypeError):
+        # If parsing fails, skip categories display
+        return ()
 
-        # Format relevance score
-        score_display = f"{relevance_score:.1f}" if relevance_score else "N/A"
-
-        # Format matched categories as tags
-        categories_html = ""
-        if matched_categories:
-            try:
-                categories = json.loads(matched_categories)
-                category_tags = []
-                for cat in categories[:3]:  # Show max 3 categories
-                    cat_display = cat.strip().replace("-", " ").title()
-                    category_tags.append(
-                        f'<span style="display: inline-block; background-color: #e8f4f8; color: #0066cc; '
-                        f"padding: 4px 8px; border-radius: 4px; font-size: 12px; margin-right: 4px; "
-                        f'margin-bottom: 4px;">{cat_display}</span>'
-                    )
-                categories_html = "".join(category_tags)
-            except (json.JSONDecodeError, TypeError):
-                # If parsing fails, skip categories display
-                pass
-
-        # Truncate summary if too long
-        if summary and len(summary) > 300:
-            summary = summary[:297] + "..."
-
-        # Build the article card
-        article_link = f"{APP_BASE_URL}/article/{article_id}"
-
-        card_html = f"""
-        <div style="background-color: #ffffff; border: 1px solid #e0e0e0; border-radius: 8px;
-                    padding: 20px; margin-bottom: 20px;">
-            <div style="margin-bottom: 8px;">
-                <span style="background-color: #ff6b35; color: white; padding: 4px 10px;
-                             border-radius: 4px; font-size: 12px; font-weight: bold;">
-                    Score: {score_display}
-                </span>
-            </div>
 
-            <h2 style="margin: 12px 0; font-size: 20px; line-height: 1.4;">
-                <a href="{article_link}" style="color: #1a1a1a; text-decoration: none;">
-                    {title}
-                </a>
-            </h2>
+def prepare_article(article: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Prepare the display values of an article card for the digest template.
 
-            {f'<div style="margin: 12px 0;">{categories_html}</div>' if categories_html else ''}
+    Args:
+        article: Article dictionary
 
-            {f'<p style="color: #4a4a4a; line-height: 1.6; margin: 12px 0;">{summary}</p>' if summary else ''}
+    Returns:
+        Dictionary with the card's title, link, score, categories and summary
+    """
+    relevance_score = article.get("relevance_score", 0)
+    matched_categories = article.get("matched_categories", "")
+    summary = article.get("article_summary", "")
 
-            <div style="margin-top: 12px;">
-                <a href="{article_link}"
-                   style="color: #0066cc; text-decoration: none; font-weight: 500; margin-right: 16px;">
-                    Read Article &rarr;
-                </a>
-            </div>
-        </div>
-        """
-        article_cards.append(card_html)
+    # Format matched categories as tags
+    categories = format_categories(matched_categories) if matched_categories else ()
 
-    articles_html = "".join(article_cards)
+    # Truncate summary if too long
+    if summary and len(summary) > 300:
+        summary = summary[:297] + "..."
 
-    # Complete email HTML
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Your Personalized Article Digest</title>
-    </head>
-    <body style="margin: 0; padding: 0; background-color: #f5f5f5; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-            <!-- Header -->
-            <div style="background-color: #1a1a1a; color: white; padding: 30px 20px;
-                        border-radius: 8px 8px 0 0; text-align: center;">
-                <h1 style="margin: 0; font-size: 28px; font-weight: 600;">
-                    Your Personalized Article Digest
-                </h1>
-                <p style="margin: 10px 0 0; font-size: 16px; opacity: 0.9;">
-                    {len(articles)} new article{"s" if len(articles) != 1 else ""} selected for you
-                </p>
-            </div>
+    return {
+        "title": article.get("title", "Untitled Article"),
+        "link": f"{APP_BASE_URL}/article/{article.get('article_id', 0)}",
+        # Format relevance score
+        "score": f"{relevance_score:.1f}" if relevance_score else "N/A",
+        "categories": categories,
+        "summary": summary,
+    }
 
-            <!-- Content -->
-            <div style="background-color: #f9f9f9; padding: 20px; border-radius: 0 0 8px 8px;">
-                <p style="color: #4a4a4a; line-height: 1.6; margin-top: 0;">
-                    Hi! Here are your latest personalized articles based on your interests.
-                </p>
 
-                {articles_html}
+def generate_html_email(user_email: str, articles: List[Dict[str, Any]]) -> str:
+    """
+    Generate HTML email content for the digest.
 
-                <!-- Footer -->
-                <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #e0e0e0;
-                            text-align: center; color: #666666; font-size: 14px;">
-                    <p style="margin: 0 0 10px;">
-                        This digest was sent to {user_email}
-                    </p>
-                    <p style="margin: 0;">
-                        <a href="{APP_BASE_URL}/profile"
-                           style="color: #0066cc; text-decoration: none;">
-                            Manage your preferences
-                        </a>
-                    </p>
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
+    Args:
+        user_email: User's email address
+        articles: List of article dictionaries
+
+    Returns:
+        HTML string for the email body
     """
+    return DIGEST_TEMPLATE.render(
+        user_email=user_email,
+        articles=[prepare_article(article) for article in articles],
+        app_base_url=APP_BASE_URL,
+    )
+
 
-    return html
+def chunked(items: List[int], size: int = MAX_SQL_VARIABLES) -> Iterator[List[int]]:
+    """Split a list into consecutive chunks of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
 
 
-def mark_articles_as_sent(user_article_ids: List[int]) -> None:
+def mark_articles_as_sent(conn: sqlite3.Connection, user_article_ids: List[int]) -> None:
     """
     Mark articles as sent in the database.
 
+    The caller is responsible for committing.
+
     Args:
+        conn: Database connection
         user_article_ids: List of user_article IDs to mark as sent
     """
     if not user_article_ids:
         return
 
-    conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Create placeholders for SQL IN clause
-    placeholders = ",".join("?" * len(user_article_ids))
-    query = f"UPDATE user_articles SET is_sent = 1 WHERE id IN ({placeholders})"
-
-    cursor.execute(query, user_article_ids)
-    conn.commit()
-    conn.close()
+    for ids in chunked(user_article_ids):
+        # Create placeholders for SQL IN clause
+        placeholders = ",".join("?" * len(ids))
+        query = f"UPDATE user_articles SET is_sent = 1 WHERE id IN ({placeholders})"
+        cursor.execute(query, ids)
 
     log.info(f"Marked {len(user_article_ids)} articles as sent")
 
 
-def mark_empty_categories_as_sent(user_id: int) -> None:
+def mark_empty_categories_as_sent(conn: sqlite3.Connection, user_ids: List[int]) -> None:
     """
     Mark articles with NULL or empty matched_categories as sent without including them in digest.
 
+    The caller is responsible for committing.
+
     Args:
-        user_id: The user's ID
+        conn: Database connection
+        user_ids: IDs of the users whose articles to mark
     """
-    conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = """
-        UPDATE user_articles
-        SET is_sent = 1
-        WHERE user_id = ? AND is_sent = 0
-            AND (matched_categories IS NULL OR matched_categories = '[]')
-    """
-
-    cursor.execute(query, (user_id,))
-    rows_affected = cursor.rowcount
-    conn.commit()
-    conn.close()
+    rows_affected = 0
+    for ids in chunked(user_ids):
+        placeholders = ",".join("?" * len(ids))
+        query = f"""
+            UPDATE user_articles
+            SET is_sent = 1
+            WHERE user_id IN ({placeholders}) AND is_sent = 0
+                AND (matched_categories IS NULL OR matched_categories = '[]')
+        """
+        cursor.execute(query, ids)
+        rows_affected += cursor.rowcount
 
     if rows_affected > 0:
-        log.info(f"Marked {rows_affected} articles with empty categories as sent for user {user_id}")
+        log.info(f"Marked {rows_affected} articles with empty categories as sent")
 
 
 def send_digest_to_user(
@@ -324,13 +354,6 @@ def send_digest_to_user(
         # Send email
         mail.send(recipient=email, subject=subject, content=html_content)
 
-        # Mark articles as sent
-        user_article_ids = [article["user_article_id"] for article in articles]
-        mark_articles_as_sent(user_article_ids)
-
-        # Mark articles with NULL or empty matched_categories as sent
-        mark_empty_categories_as_sent(user_id)
-
         log.info(f"Successfully sent digest to {email} with {article_count} articles")
         return True
 
@@ -343,32 +366,60 @@ def main():
     """Main function to run the digest script."""
     log.info("Starting email digest script")
 
-    # Get users with unsent articles
-    users = get_users_with_unsent_articles()
-
-    if not users:
-        log.info("No users with unsent articles found. Exiting.")
-        return
+    # One connection is used for the whole run
+    conn = get_db_connection()
 
-    # Process each user
-    success_count = 0
-    failure_count = 0
-
-    for user_id, user_data in users.items():
-        # Get unsent articles for this user
-        articles = get_unsent_articles_for_user(user_id)
-
-        if not articles:
-            log.warning(
-                f"No articles found for user {user_id} (email: {user_data['email']})"
-            )
-            continue
-
-        # Send digest
-        if send_digest_to_user(user_id, user_data, articles):
-            success_count += 1
-        else:
-            failure_count += 1
+    try:
+        # Get users with unsent articles, and the articles themselves
+        users, articles_by_user = get_unsent_digests(conn)
+
+        if not users:
+            log.info("No users with unsent articles found. Exiting.")
+            return
+
+        # Sending is bound by the SES round-trip, so digests are sent from a
+        # pool of threads
+        executor = ThreadPoolExecutor(max_workers=DIGEST_SEND_WORKERS)
+        futures = {}
+        try:
+            for user_id, user_data in users.items():
+                articles = articles_by_user[user_id]
+                log.info(f"Found {len(articles)} unsent articles for user {user_id}")
+
+                # Send digest
+                future = executor.submit(send_digest_to_user, user_id, user_data, articles)
+                futures[future] = user_id
+
+            executor.shutdown(wait=True)
+        except BaseException:
+            # Don't start the digests that are still queued; the ones being
+            # sent finish and are recorded below
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            # Mark everything that was sent in a single transaction, even if
+            # the run was interrupted, so those digests aren't sent again.
+            # Articles with NULL or empty matched_categories are marked as
+            # well, for the users that got a digest.
+            finished = [
+                (future, user_id)
+                for future, user_id in futures.items()
+                if future.done() and not future.cancelled() and future.exception() is None
+            ]
+            sent_user_ids = [user_id for future, user_id in finished if future.result()]
+            sent_user_article_ids = [
+                article["user_article_id"]
+                for user_id in sent_user_ids
+                for article in articles_by_user[user_id]
+            ]
+            with conn:
+                mark_articles_as_sent(conn, sent_user_article_ids)
+                mark_empty_categories_as_sent(conn, sent_user_ids)
+
+        success_count = len(sent_user_ids)
+        failure_count = len(finished) - success_count
+    finally:
+        conn.close()
 
     # Summary
     log.info(
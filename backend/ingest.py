@@ -11,12 +11,21 @@ from html import unescape
 
 import aiosqlite
 import httpx
+import orjson
 from dotenv import load_dotenv
 
 from constants import COMMENT_DEPTH, TOP_STORIES_LIMIT
+from db import tune
 
 load_dotenv()
 
+# Matches an HTML tag (HN comment text only uses simple inline tags)
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+# Maximum number of concurrent requests to the HN API
+HN_CONCURRENCY = 20
+hn_semaphore = asyncio.Semaphore(HN_CONCURRENCY)
+
 
 async def get_top_story_ids(client: httpx.AsyncClient, limit: int) -> list[int]:
     """
@@ -35,7 +44,7 @@ async def get_top_story_ids(client: httpx.AsyncClient, limit: int) -> list[int]:
     try:
         response = await client.get(url)
         response.raise_for_status()
-        story_ids = response.json()
+        story_ids = orjson.loads(response.content)
         return story_ids[:limit]
     except Exception as e:
         print(f"Error fetching top stories: {e}")
@@ -57,51 +66,74 @@ async def fetch_item(client: httpx.AsyncClient, hn_id: int) -> dict | None:
     url = f"{base_url}/item/{hn_id}.json"
 
     try:
-        response = await client.get(url)
+        async with hn_semaphore:
+            response = await client.get(url)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     except Exception as e:
         print(f"Warning: Failed to fetch item {hn_id}: {e}")
         return None
 
 
-async def fetch_comments_recursive(
+async def fetch_comments(
     client: httpx.AsyncClient,
     comment_ids: list[int],
     current_depth: int,
     max_depth: int,
 ) -> list[dict]:
     """
-    Recursively fetch comments up to a specified depth.
+    Fetch comments up to a specified depth.
+
+    Comments are fetched level by level, with all comments of a level
+    requested concurrently, and returned in depth-first (thread) order.
 
     Args:
         client: HTTP client for making requests
-        comment_ids: List of comment IDs to fetch
-        current_depth: Current recursion depth
-        max_depth: Maximum depth to recurse (0 = no recursion)
+        comment_ids: List of top-level comment IDs to fetch
+        current_depth: Depth of the top-level comments
+        max_depth: Maximum depth to descend to (0 = top-level comments only)
 
     Returns:
         Flattened list of all comment dicts
     """
-    if not comment_ids or current_depth > max_depth:
-        return []
+    # Each node is (comment, children); each pending entry is the list of IDs
+    # to fetch and the list their nodes should be appended to
+    roots = []
+    pending = [(comment_ids, roots)]
+    depth = current_depth
+
+    while pending and depth <= max_depth:
+        ids = [comment_id for batch_ids, _ in pending for comment_id in batch_ids]
+        fetched = iter(
+            await asyncio.gather(*(fetch_item(client, comment_id) for comment_id in ids))
+        )
 
-    comments = []
+        next_pending = []
+        for batch_ids, siblings in pending:
+            for _ in batch_ids:
+                comment = next(fetched)
+                if not comment or comment.get("deleted") or comment.get("dead"):
+                    continue
 
-    # Fetch all comments at this level
-    for comment_id in comment_ids:
-        comment = await fetch_item(client, comment_id)
-        if comment and not comment.get("deleted") and not comment.get("dead"):
-            # Store the comment with its depth for formatting
-            comment["_depth"] = current_depth
-            comments.append(comment)
-
-            # Recursively fetch child comments if we haven't reached max depth
-            if current_depth < max_depth and comment.get("kids"):
-                child_comments = await fetch_comments_recursive(
-                    client, comment["kids"], current_depth + 1, max_depth
-                )
-                comments.extend(child_comments)
+                # Store the comment with its depth for formatting
+                comment["_depth"] = depth
+                children = []
+                siblings.append((comment, children))
+
+                # Fetch child comments in the next round if we haven't reached max depth
+                if depth < max_depth and comment.get("kids"):
+                    next_pending.append((comment["kids"], children))
+
+        pending = next_pending
+        depth += 1
+
+    # Flatten the tree in depth-first order
+    comments = []
+    stack = list(reversed(roots))
+    while stack:
+        comment, children = stack.pop()
+        comments.append(comment)
+        stack.extend(reversed(children))
 
     return comments
 
@@ -117,7 +149,7 @@ def strip_html(text: str) -> str:
         Plain text
     """
     # Remove HTML tags
-    text = re.sub(r"<[^>]+>", "", text)
+    text = HTML_TAG_RE.sub("", text)
     # Decode HTML entities
     text = unescape(text)
     return text
@@ -184,9 +216,7 @@ async def process_story(
     # Fetch comments if the story has any
     comments = []
     if story.get("kids"):
-        comments = await fetch_comments_recursive(
-            client, story["kids"], 0, max_comment_depth
-        )
+        comments = await fetch_comments(client, story["kids"], 0, max_comment_depth)
 
     # Format comments as text
     comments_text = format_comments_as_text(comments)
@@ -207,54 +237,70 @@ async def process_story(
     return result
 
 
-async def insert_story_with_content(db: aiosqlite.Connection, story: dict) -> bool:
+async def get_existing_hn_ids(db: aiosqlite.Connection, hn_ids: list[int]) -> set[int]:
     """
-    Insert story into links table and comments into contents table.
+    Find which of the given HN IDs are already stored in the links table.
 
     Args:
         db: Database connection
-        story: Story data dict
+        hn_ids: HN story IDs to check
 
     Returns:
-        True if inserted successfully, False if skipped (already exists)
+        Set of HN IDs that already exist
     """
-    # Check if story already exists
-    cursor = await db.execute("SELECT id FROM links WHERE hn_id = ?", (story["hn_id"],))
-    existing = await cursor.fetchone()
-
-    if existing:
-        return False
-
-    # Insert into links table
-    await db.execute(
-        """
-        INSERT INTO links (hn_id, title, url, score, time, author, descendants, hnlink)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            story["hn_id"],
-            story["title"],
-            story["url"],
-            story["score"],
-            story["time"],
-            story["author"],
-            story["descendants"],
-            story["hnlink"],
-        ),
+    placeholders = ", ".join("?" * len(hn_ids))
+    cursor = await db.execute(
+        f"SELECT hn_id FROM links WHERE hn_id IN ({placeholders})", hn_ids
     )
+    return {row[0] for row in await cursor.fetchall()}
+
 
-    # Get the auto-generated link ID
-    cursor = await db.execute("SELECT last_insert_rowid()")
-    link_id = (await cursor.fetchone())[0]
+async def insert_stories_with_content(db: aiosqlite.Connection, stories: list[dict]) -> int:
+    """
+    Insert stories into links table and their comments into contents table
+    in a single transaction.
+
+    Args:
+        db: Database connection
+        stories: List of story data dicts
+
+    Returns:
+        Number of stories inserted (stories that already exist are skipped)
+    """
+    contents_rows = []
+    for story in stories:
+        # Insert into links table, getting back the auto-generated link ID
+        cursor = await db.execute(
+            """
+            INSERT OR IGNORE INTO links (hn_id, title, url, score, time, author, descendants, hnlink)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING id
+            """,
+            (
+                story["hn_id"],
+                story["title"],
+                story["url"],
+                story["score"],
+                story["time"],
+                story["author"],
+                story["descendants"],
+                story["hnlink"],
+            ),
+        )
+        row = await cursor.fetchone()
+
+        # No row is returned if the story already exists
+        if row:
+            contents_rows.append((row[0], None, story["comments_text"]))
 
     # Insert into contents table (article is None for now, will be fetched in scrape phase)
-    await db.execute(
+    await db.executemany(
         "INSERT INTO contents (link_id, article, comments) VALUES (?, ?, ?)",
-        (link_id, None, story["comments_text"]),
+        contents_rows,
     )
 
     await db.commit()
-    return True
+    return len(contents_rows)
 
 
 async def main():
@@ -277,8 +323,11 @@ async def main():
 
     print(f"Fetching top {TOP_STORIES_LIMIT} stories from HN...")
 
-    # Create HTTP client
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    # Create HTTP client; the connection pool matches the request concurrency
+    limits = httpx.Limits(
+        max_connections=HN_CONCURRENCY, max_keepalive_connections=HN_CONCURRENCY
+    )
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
         # Fetch top story IDs
         story_ids = await get_top_story_ids(client, TOP_STORIES_LIMIT)
 
@@ -288,43 +337,32 @@ async def main():
 
         print(f"Found {len(story_ids)} story IDs")
 
-        # Process each story
-        inserted_count = 0
-        skipped_count = 0
-        failed_count = 0
-
         async with aiosqlite.connect(db_path) as db:
-            for i, hn_id in enumerate(story_ids):
-                print(
-                    f"Processing story {i + 1}/{len(story_ids)} "
-                    f"(inserted: {inserted_count}, skipped: {skipped_count}, failed: {failed_count})..."
-                )
-
-                # Check if story already exists before fetching
-                cursor = await db.execute(
-                    "SELECT id FROM links WHERE hn_id = ?", (hn_id,)
-                )
-                existing = await cursor.fetchone()
-
-                if existing:
-                    skipped_count += 1
-                    continue
+            await tune(db)
 
-                # Fetch story and comments
-                story = await process_story(client, hn_id, COMMENT_DEPTH)
+            # Skip stories that were already ingested before fetching anything
+            existing_ids = await get_existing_hn_ids(db, story_ids)
+            new_ids = [hn_id for hn_id in story_ids if hn_id not in existing_ids]
+            skipped_count = len(story_ids) - len(new_ids)
 
-                if not story:
-                    failed_count += 1
-                    continue
+            print(
+                f"Fetching {len(new_ids)} new stories "
+                f"(skipped {skipped_count} already ingested)..."
+            )
+
+            # Fetch all stories and their comments concurrently
+            stories = await asyncio.gather(
+                *(process_story(client, hn_id, COMMENT_DEPTH) for hn_id in new_ids)
+            )
+
+            fetched = [story for story in stories if story]
+            failed_count = len(stories) - len(fetched)
 
-                # Insert into database
-                inserted = await insert_story_with_content(db, story)
+            # Insert into database
+            inserted_count = await insert_stories_with_content(db, fetched)
 
-                if inserted:
-                    inserted_count += 1
-                else:
-                    # This shouldn't happen since we checked above, but just in case
-                    skipped_count += 1
+            # This shouldn't happen since we checked above, but just in case
+            skipped_count += len(fetched) - inserted_count
 
         # Final report
         print("\n" + "=" * 60)
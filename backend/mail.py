@@ -1,3 +1,4 @@
+from functools import lru_cache
 from os import environ
 from logging import getLogger
 
@@ -10,26 +11,20 @@ load_dotenv()
 
 log = getLogger(__name__)
 
+AWS_ACCESS_KEY_ID = environ.get("AWS_ACCESS_KEY_ID")
+AWS_REGION = environ.get("AWS_REGION")
+AWS_SECRET_ACCESS = environ.get("AWS_SECRET_ACCESS")
+FROM_EMAIL = environ.get("FROM_EMAIL")
 
-def send(
-    recipient: str,
-    subject: str,
-    content: str,
-):
-    """
-    Send a html-only email using Amazon SES
 
-    :param recipient: The email address of the recipient
-    :param subject: The subject of the email
-    :param body_html: The body of the email in HTML format
+@lru_cache(maxsize=1)
+def get_ses_client():
     """
+    Create the Amazon SES client, once.
 
-
-    AWS_ACCESS_KEY_ID = environ.get("AWS_ACCESS_KEY_ID")
-    AWS_REGION = environ.get("AWS_REGION")
-    AWS_SECRET_ACCESS = environ.get("AWS_SECRET_ACCESS")
-    FROM_EMAIL = environ.get("FROM_EMAIL")
-
+    Building a session and client resolves credentials and loads the service
+    model, so it is reused for all emails (boto3 clients are thread-safe).
+    """
     if not AWS_ACCESS_KEY_ID or not AWS_REGION or not AWS_SECRET_ACCESS or not FROM_EMAIL:
         raise ValueError("AWS credentials or FROM_EMAIL are not set in environment variables.")
 
@@ -41,7 +36,22 @@ def send(
     )
 
     # Create an SES client
-    ses = session.client("ses")
+    return session.client("ses")
+
+
+def send(
+    recipient: str,
+    subject: str,
+    content: str,
+):
+    """
+    Send a html-only email using Amazon SES
+
+    :param recipient: The email address of the recipient
+    :param subject: The subject of the email
+    :param body_html: The body of the email in HTML format
+    """
+    ses = get_ses_client()
 
     # Try to send the email
     try:
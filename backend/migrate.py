@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+One-off migration: remove duplicate analyses and add the unique index on
+analysis.content_id.
+
+Older databases may hold several analyses of the same content, since they
+were saved one row at a time without a constraint. Only the first analysis
+of each content is kept.
+
+Usage:
+    uv run python migrate.py
+"""
+
+import os
+import sqlite3
+
+from dotenv import load_dotenv
+
+from db import ANALYSIS_INDEX
+
+load_dotenv()
+
+DB_PATH = os.environ.get("DB_PATH", "../data/db.sqlite")
+
+
+def main():
+    """
+    Main migration procedure.
+    """
+    print(f"Migrating {DB_PATH}...")
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM analysis WHERE id NOT IN (SELECT MIN(id) FROM analysis GROUP BY content_id)"
+            )
+            print(f"Removed {cursor.rowcount} duplicate analyses")
+            conn.execute(ANALYSIS_INDEX)
+        print("Migration complete!")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
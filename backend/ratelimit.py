@@ -0,0 +1,66 @@
+"""
+Proactive rate limiting for LLM calls.
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Async token bucket limiter.
+
+    Tokens refill continuously at `rate` per second, up to `capacity`. Callers
+    wait in `acquire` until enough tokens are available, so requests are spread
+    out to stay under the provider limits instead of failing and being retried.
+
+    The rate adapts to the provider: `slow_down` empties the bucket and halves
+    the rate (e.g. after a 429 response), so the next requests wait for the
+    bucket to refill, and `speed_up` ramps the rate back towards the
+    configured maximum.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until `amount` tokens are available and take them."""
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def slow_down(self) -> None:
+        """
+        Empty the bucket and halve the refill rate (down to 1/16 of the
+        configured maximum).
+
+        Without emptying it, a full bucket would let retries (and other
+        waiting requests) through immediately, straight into the same limit.
+        """
+        self._refill()
+        self.tokens = 0
+        self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def speed_up(self) -> None:
+        """Increase the refill rate by 10% (up to the configured maximum)."""
+        self._refill()
+        self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+def is_rate_limit_error(err: Exception) -> bool:
+    """Check whether an LLM provider error is a rate limit (HTTP 429) response."""
+    return getattr(err, "status_code", None) == 429
@@ -18,11 +18,12 @@ CREATE TABLE IF NOT EXISTS "contents" (
 	"comments"	TEXT,
 	PRIMARY KEY("id" AUTOINCREMENT)
 );
+CREATE INDEX idx_contents_link ON contents(link_id);
 CREATE TABLE users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     email TEXT NOT NULL UNIQUE,
     password_hash TEXT NOT NULL,
-    token TEXT UNIQUE,  -- Session token (nullable until user logs in)
+    token TEXT UNIQUE,  -- SHA-256 hex digest of the session token (nullable until user logs in)
     is_active INTEGER DEFAULT 1,  -- SQLite uses INTEGER for boolean (1=true, 0=false)
     is_email_verified INTEGER DEFAULT 1,  -- Default to true for now
     categories TEXT DEFAULT '',  -- Comma-separated category slugs
@@ -30,8 +31,6 @@ CREATE TABLE users (
     created_at INTEGER NOT NULL,  -- Unix timestamp
     updated_at INTEGER NOT NULL   -- Unix timestamp
 );
-CREATE INDEX idx_users_email ON users(email);
-CREATE INDEX idx_users_token ON users(token);
 CREATE TABLE messages (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_article_id INTEGER NOT NULL,  -- FK to user_articles entry (not directly to user+article)
@@ -40,7 +39,7 @@ CREATE TABLE messages (
     timestamp INTEGER NOT NULL,  -- Unix timestamp in milliseconds for ordering
     FOREIGN KEY (user_article_id) REFERENCES user_articles(id) ON DELETE CASCADE
 );
-CREATE INDEX idx_messages_user_article ON messages(user_article_id);
+CREATE INDEX idx_messages_user_article_timestamp ON messages(user_article_id, timestamp);
 CREATE INDEX idx_messages_timestamp ON messages(timestamp);
 CREATE TABLE IF NOT EXISTS "analysis" (
 	"id"	INTEGER NOT NULL,
@@ -51,6 +50,7 @@ CREATE TABLE IF NOT EXISTS "analysis" (
 	"scores"	TEXT,
 	PRIMARY KEY("id" AUTOINCREMENT)
 );
+CREATE UNIQUE INDEX idx_analysis_content ON analysis(content_id);
 CREATE TABLE IF NOT EXISTS "user_articles" (
 	"id"	INTEGER,
 	"user_id"	INTEGER NOT NULL,
@@ -65,6 +65,6 @@ CREATE TABLE IF NOT EXISTS "user_articles" (
 	FOREIGN KEY("user_id") REFERENCES "users"("id") ON DELETE CASCADE
 );
 CREATE INDEX idx_user_articles_article ON user_articles(article_id);
+CREATE INDEX idx_user_articles_user_matched ON user_articles(user_id, article_id) WHERE matched_categories IS NOT NULL AND matched_categories != '[]';
 CREATE INDEX idx_user_articles_is_read ON user_articles(is_read);
-CREATE INDEX idx_user_articles_user ON user_articles(user_id);
 CREATE INDEX idx_user_articles_is_sent ON user_articles(is_sent);